@@ -131,7 +131,7 @@ def add_sample_schedule():
     print(f"Cleared existing schedule for this week")
 
     # Insert sample data
-    entries_added = 0
+    rows = []
     for staff in sample_staff:
         for day_offset, shift_time in staff['schedule'].items():
             if not shift_time:
@@ -146,22 +146,22 @@ def add_sample_schedule():
 
                 shift_date = current_week_start + timedelta(days=day_offset)
 
-                cursor.execute("""
-                    INSERT INTO schedules
-                    (staff_name, shift_date, department, shift_time, phone_number, shift_id, created_at)
-                    VALUES (?, ?, ?, ?, ?, NULL, datetime('now','localtime'))
-                """, (
+                rows.append((
                     staff['name'],
                     shift_date.isoformat(),
                     staff['department'],
                     shift_val,
                     staff['phone']
                 ))
-                entries_added += 1
 
+    cursor.executemany("""
+        INSERT INTO schedules
+        (staff_name, shift_date, department, shift_time, phone_number, shift_id, created_at)
+        VALUES (?, ?, ?, ?, ?, NULL, datetime('now','localtime'))
+    """, rows)
     conn.commit()
 
-    print(f"\nAdded {entries_added} schedule entries")
+    print(f"\nAdded {len(rows)} schedule entries")
 
     # Show summary
     print("\nSchedule summary by department:")
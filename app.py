@@ -68,6 +68,7 @@ from flask_limiter.util import get_remote_address
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# DB_PATH may also be a SQLite "file:" URI, e.g. a shared in-memory test database
 DB_PATH = os.environ.get("DB_PATH") or os.path.join(BASE_DIR, "dnr.db")
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER") or os.path.join(BASE_DIR, "uploads")
 CREDENTIALS_FILE = os.environ.get("CREDENTIALS_FILE") or os.path.join(BASE_DIR, ".credentials")
@@ -111,6 +112,20 @@ limiter = Limiter(
     storage_uri="memory://",
 )
 
+# bcrypt work factor for new password hashes, and the only place it is set.
+# Test fixtures lower it with the explicitly test-only DNR_TEST_BCRYPT_COST
+# (~1ms per hash at the minimum of 4). The override is ignored when
+# FLASK_ENV=production, so production deployments must set that. Verification
+# reads the cost from the stored hash, so hashes of either cost still check.
+BCRYPT_ROUNDS = 12
+if os.environ.get('DNR_TEST_BCRYPT_COST') and os.environ.get('FLASK_ENV') != 'production':
+    try:
+        # bcrypt only accepts costs 4-31
+        BCRYPT_ROUNDS = max(4, min(31, int(os.environ['DNR_TEST_BCRYPT_COST'])))
+    except ValueError:
+        logger.warning(f"Ignoring invalid DNR_TEST_BCRYPT_COST={os.environ['DNR_TEST_BCRYPT_COST']!r}; "
+                       f"using {BCRYPT_ROUNDS}")
+
 # Allowed file extensions and MIME types for uploads
 # Allowed file extensions and MIME types for uploads
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf', 'docx'}
@@ -217,7 +232,7 @@ def reset_login_attempts(username: str):
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt with automatic salt generation."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 
 def verify_password(password: str, hashed: str) -> bool:
@@ -230,7 +245,7 @@ def verify_password(password: str, hashed: str) -> bool:
 
 # Database Helper Functions
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, uri=True)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -401,7 +416,7 @@ def dict_factory(cursor, row):
 
 
 def connect_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, uri=True)
     conn.row_factory = dict_factory
     return conn
 
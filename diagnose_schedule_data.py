@@ -58,7 +58,8 @@ def diagnose_schedule_data():
     end_str = week_dates[-1].isoformat()
 
     cursor.execute("""
-        SELECT * FROM schedules
+        SELECT staff_name, department, shift_time, phone_number, shift_date
+        FROM schedules
         WHERE shift_date BETWEEN ? AND ?
         ORDER BY shift_date, department, staff_name
     """, (start_str, end_str))
@@ -71,7 +72,11 @@ def diagnose_schedule_data():
 
     # 4. Show sample data
     print("\n[4/5] Sample schedule entries...")
-    cursor.execute("SELECT * FROM schedules LIMIT 5")
+    cursor.execute("""
+        SELECT staff_name, shift_date, department, shift_time, shift_id, phone_number
+        FROM schedules
+        LIMIT 5
+    """)
     sample_entries = cursor.fetchall()
 
     for i, entry in enumerate(sample_entries, 1):
@@ -226,7 +226,6 @@ def import_records():
         ).fetchone()
 
         if existing:
-            print(f"  Skipped (exists): {name}")
             skipped += 1
             continue
 
@@ -252,7 +251,6 @@ def import_records():
             VALUES (?, ?, 'IMP', 'Imported from legacy DNR list. Original reason: ' || ?, 1)
         """, (record_id, today, reason_text))
 
-        print(f"  Imported: {name}")
         imported += 1
 
     conn.commit()
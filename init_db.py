@@ -10,9 +10,16 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "dnr.db")
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, uri=True)
     cursor = conn.cursor()
 
+    # The reset is all-or-nothing and simply rerun on failure, so skip fsyncs
+    # and build the whole schema inside a single transaction.
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("BEGIN IMMEDIATE")
+
     # Drop existing tables if they exist (for clean reset)
     cursor.execute("DROP TABLE IF EXISTS log_entries")
     cursor.execute("DROP TABLE IF EXISTS maintenance_items")
@@ -356,7 +363,6 @@ def init_db():
     """)
     # Unique constraint on staff name per shift to prevent accidental dupes (e.g. adding 'John' twice to Shift 1)
     cursor.execute("CREATE UNIQUE INDEX idx_schedules_unique_staff ON schedules(shift_date, shift_id, staff_name)")
-    cursor.execute("CREATE INDEX idx_schedules_date ON schedules(shift_date)")
 
     # Wake-up Calls
     cursor.execute("""
@@ -395,6 +401,9 @@ def init_db():
     cursor.execute("CREATE UNIQUE INDEX idx_login_attempts_username ON login_attempts(username)")
 
     conn.commit()
+    # Seed planner statistics for the freshly created indexes
+    conn.execute("PRAGMA analysis_limit=400")
+    conn.execute("PRAGMA optimize")
     conn.close()
     print(f"Database initialized at: {DB_PATH}")
 
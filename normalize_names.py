@@ -6,19 +6,15 @@ def normalize_name(name: str) -> str:
     return " ".join(name.strip().split()).title()
 
 conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
+conn.create_function("norm_name", 1, normalize_name, deterministic=True)
 
-rows = cur.execute("SELECT id, guest_name FROM records").fetchall()
-
-for record_id, name in rows:
-    fixed = normalize_name(name)
-    if fixed != name:
-        cur.execute(
-            "UPDATE records SET guest_name = ? WHERE id = ?",
-            (fixed, record_id)
-        )
-
-conn.commit()
+# Normalize in SQL so rows never round-trip through Python; the WHERE
+# clause skips names that are already clean.
+with conn:
+    conn.execute(
+        "UPDATE records SET guest_name = norm_name(guest_name) "
+        "WHERE guest_name != norm_name(guest_name)"
+    )
 conn.close()
 
 print("Name normalization complete.")
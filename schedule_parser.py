@@ -6,7 +6,7 @@ Returns normalized schedule entries matching the paper-style format.
 """
 import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import Any, Dict, Iterator, List, Optional
 
 # Import libraries with fallback handling
 try:
@@ -38,6 +38,13 @@ DEPARTMENT_KEYWORDS = {
     'inspecting': 'INSPECTING',
 }
 
+# Single-scan prefilter for DEPARTMENT_KEYWORDS; most rows are staff rows with
+# no keyword, so detect_department can return without walking the dict.
+_DEPARTMENT_RE = re.compile('|'.join(map(re.escape, DEPARTMENT_KEYWORDS)), re.IGNORECASE)
+
+# Substrings that mark a row as a repeated header rather than a staff member
+_HEADER_RE = re.compile(r'day|date|occupancy|mon|tue|wed|thu|fri|sat|sun', re.IGNORECASE)
+
 # Day of week patterns
 DAY_PATTERNS = {
     'mon': 0, 'monday': 0,
@@ -49,6 +56,11 @@ DAY_PATTERNS = {
     'sun': 6, 'sunday': 6,
 }
 
+# Every DAY_PATTERNS key contains its three-letter prefix, so one scan for the
+# prefixes finds all day names in a cell. The lookahead keeps overlapping hits
+# so the lowest offset wins, as with the first match in DAY_PATTERNS order.
+_DAY_RE = re.compile(r'(?=(mon|tue|wed|thu|fri|sat|sun))')
+
 # Time pattern regex (matches "7am-3pm", "3pm-11pm", "8:45am-12:45pm", etc.)
 TIME_PATTERN = re.compile(
     r'(\d{1,2}):?(\d{2})?\s*(am|pm)\s*[-–]\s*(\d{1,2}):?(\d{2})?\s*(am|pm)',
@@ -106,6 +118,9 @@ def detect_department(text: str, current_dept: Optional[str] = None) -> Optional
     if not text:
         return current_dept
 
+    if not _DEPARTMENT_RE.search(text):
+        return current_dept
+
     text_lower = text.lower().strip()
 
     for keyword, dept_name in DEPARTMENT_KEYWORDS.items():
@@ -130,11 +145,11 @@ def parse_pdf_schedule(file_path: str, week_start_date: datetime) -> Dict[str, A
         raise ScheduleParseError("pdfplumber not installed. Cannot parse PDF files.")
 
     try:
-        with pdfplumber.open(file_path) as pdf:
+        # Schedules are single-page; only load page 1 (pdfplumber counts from 1)
+        with pdfplumber.open(file_path, pages=[1]) as pdf:
             if not pdf.pages:
                 raise ScheduleParseError("PDF file is empty")
 
-            # Extract tables from first page (schedules are typically single-page)
             page = pdf.pages[0]
             tables = page.extract_tables()
 
@@ -170,13 +185,7 @@ def parse_docx_schedule(file_path: str, week_start_date: datetime) -> Dict[str,
 
         # Convert DOCX table to list of lists format (like PDF tables)
         table = doc.tables[0]
-        table_data = []
-
-        for row in table.rows:
-            row_data = []
-            for cell in row.cells:
-                row_data.append(cell.text.strip())
-            table_data.append(row_data)
+        table_data = [[cell.text.strip() for cell in row.cells] for row in table.rows]
 
         return _parse_table_data(table_data, week_start_date)
 
@@ -184,18 +193,14 @@ def parse_docx_schedule(file_path: str, week_start_date: datetime) -> Dict[str,
         raise ScheduleParseError(f"Failed to parse DOCX: {str(e)}")
 
 
-def _parse_table_data(table: List[List[str]], week_start_date: datetime) -> Dict[str, Any]:
+def _iter_entries(table: List[List[str]], week_start_date: datetime) -> Iterator[Dict[str, Any]]:
     """
-    Parse table data (from PDF or DOCX) into structured schedule entries.
+    Yield schedule entries from table data (from PDF or DOCX).
 
     Args:
         table: List of rows, where each row is a list of cell values
         week_start_date: Monday of the week this schedule is for
-
-    Returns:
-        Dictionary with 'entries' list and 'metadata'
     """
-    entries = []
     current_department = None
     day_columns = {}  # Maps column index to day offset (0=Mon, 1=Tue, etc.)
 
@@ -210,12 +215,10 @@ def _parse_table_data(table: List[List[str]], week_start_date: datetime) -> Dict
             if not cell:
                 continue
 
-            cell_lower = cell.lower().strip()
-            for day_key, day_offset in DAY_PATTERNS.items():
-                if day_key in cell_lower:
-                    day_columns[col_idx] = day_offset
-                    found_days = True
-                    break
+            day_keys = _DAY_RE.findall(cell.lower())
+            if day_keys:
+                day_columns[col_idx] = min(DAY_PATTERNS[key] for key in day_keys)
+                found_days = True
 
         if found_days:
             # Process rows after header
@@ -246,7 +249,7 @@ def _parse_table_data(table: List[List[str]], week_start_date: datetime) -> Dict
                 # Skip empty or header-like rows
                 if not staff_name or len(staff_name) < 2:
                     continue
-                if any(kw in staff_name.lower() for kw in ['day', 'date', 'occupancy', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']):
+                if _HEADER_RE.search(staff_name):
                     continue
 
                 # Extract shift times for each day
@@ -255,22 +258,52 @@ def _parse_table_data(table: List[List[str]], week_start_date: datetime) -> Dict
                         continue
 
                     cell_value = data_row[col_idx]
-                    shift_time = normalize_time(cell_value) if cell_value else None
+                    if not cell_value:
+                        continue
+
+                    # Cheap prefilter: every shift is "ON" or has am/pm in it,
+                    # so names, phone numbers and notes skip the regex.
+                    cell_lower = cell_value.lower()
+                    if 'am' not in cell_lower and 'pm' not in cell_lower and cell_lower.strip() != 'on':
+                        continue
+
+                    shift_time = normalize_time(cell_value)
 
                     # Only create entry if there's a shift time
                     if shift_time:
                         shift_date = week_start_date + timedelta(days=day_offset)
 
-                        entries.append({
+                        yield {
                             'staff_name': staff_name,
                             'department': current_department,
                             'phone_number': phone_number,
                             'shift_date': shift_date.strftime('%Y-%m-%d'),
                             'shift_time': shift_time,
-                        })
+                        }
 
             break
 
+
+def _parse_table_data(table: List[List[str]], week_start_date: datetime) -> Dict[str, Any]:
+    """
+    Parse table data (from PDF or DOCX) into structured schedule entries.
+
+    Args:
+        table: List of rows, where each row is a list of cell values
+        week_start_date: Monday of the week this schedule is for
+
+    Returns:
+        Dictionary with 'entries' list and 'metadata'
+    """
+    entries = []
+    departments_seen = set()
+    staff_seen = set()
+
+    for entry in _iter_entries(table, week_start_date):
+        entries.append(entry)
+        departments_seen.add(entry['department'])
+        staff_seen.add(entry['staff_name'])
+
     if not entries:
         raise ScheduleParseError("No schedule entries could be extracted from file")
 
@@ -279,8 +312,8 @@ def _parse_table_data(table: List[List[str]], week_start_date: datetime) -> Dict
         'metadata': {
             'week_start': week_start_date.strftime('%Y-%m-%d'),
             'total_entries': len(entries),
-            'departments': list(set(e['department'] for e in entries if e['department'])),
-            'staff_count': len(set(e['staff_name'] for e in entries)),
+            'departments': list(departments_seen),
+            'staff_count': len(staff_seen),
         }
     }
 
@@ -308,11 +341,15 @@ def validate_parsed_schedule(data: Dict[str, Any]) -> List[str]:
     if no_dept_count > 0:
         warnings.append(f"{no_dept_count} entries have no department assigned")
 
-    # Check for unusual shift times
+    # Check for unusual shift times. A schedule only uses a handful of distinct
+    # shift strings, so each one is matched against TIME_PATTERN once.
+    time_ok = {}
     for entry in entries:
         shift_time = entry.get('shift_time', '')
         if shift_time and shift_time != 'ON':
-            if not TIME_PATTERN.search(shift_time):
+            if shift_time not in time_ok:
+                time_ok[shift_time] = TIME_PATTERN.search(shift_time) is not None
+            if not time_ok[shift_time]:
                 warnings.append(f"Unusual shift time format: '{shift_time}' for {entry.get('staff_name')}")
 
     # Check for duplicate entries (same person, same day, same time)
@@ -1,23 +1,7 @@
-from app import get_db_connection
-import bcrypt
+from setup_test_users import seed_users
 
 def setup():
-    conn = get_db_connection()
-    
-    # Clean up
-    conn.execute("DELETE FROM users WHERE username = 'manager_qa'")
-    
-    # Create Manager
-    pw = b'manager123'
-    hashed = bcrypt.hashpw(pw, bcrypt.gensalt()).decode('utf-8')
-    
-    conn.execute("""
-        INSERT INTO users (username, password_hash, role, is_active, force_password_change)
-        VALUES ('manager_qa', ?, 'manager', 1, 0)
-    """, (hashed,))
-    
-    conn.commit()
-    conn.close()
+    seed_users([('manager_qa', 'manager123', 'manager')])
     print("User 'manager_qa' created with password 'manager123'")
 
 
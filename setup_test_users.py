@@ -1,52 +1,71 @@
 """
 Setup test users for Playwright production tests
 """
-import sqlite3
 import os
 import sys
 
 # Add parent directory to path to import app
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import hash_password, get_db_connection
+# Fixture accounts in a dedicated test DB don't need production-strength
+# hashes; app.hash_password reads this when app is first imported. bcrypt does
+# 2^cost key-schedule rounds, so cost 4 (the minimum) is ~256x cheaper than the
+# default 12. Accounts seeded into the shared dnr.db keep the default cost.
+if os.environ.get("DNR_TEST") and os.environ.get("DB_PATH"):
+    os.environ.setdefault("DNR_TEST_BCRYPT_COST", "4")
+
+
+def get_fixture_connection():
+    """Open the app database, dropping durability for a dedicated test DB.
+
+    When DNR_TEST is set and DB_PATH points the app at its own test database,
+    fixture data is disposable and simply recreated if a run dies, so the
+    connection skips the fsync on every commit. The app's shared dnr.db is
+    always opened with a plain get_db_connection().
+    """
+    # Importing app pulls in Flask and runs app setup; only pay for it once a
+    # connection is actually needed.
+    from app import get_db_connection
+
+    conn = get_db_connection()
+    if os.environ.get("DNR_TEST") and os.environ.get("DB_PATH"):
+        # Both pragmas are per-connection; the file's journal mode is untouched
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+# Insert a fixture user, or reset an existing one to the fixture state
+SEED_USER_SQL = """
+    INSERT INTO users (username, password_hash, role, is_active, force_password_change)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+        password_hash = excluded.password_hash,
+        role = excluded.role,
+        is_active = excluded.is_active,
+        force_password_change = excluded.force_password_change
+"""
+
+
+def seed_users(users, active=1, force_change=0):
+    """Create or refresh fixture users from (username, password, role) tuples."""
+    from app import hash_password
+
+    conn = get_fixture_connection()
+    conn.executemany(SEED_USER_SQL, [
+        (username, hash_password(password), role, active, force_change)
+        for username, password, role in users
+    ])
+    conn.commit()
+    conn.close()
 
 def setup_test_users():
     """Create test users in the database"""
     print("Setting up test users...")
     
-    conn = get_db_connection()
-    
-    # Check if test_manager exists
-    existing = conn.execute("SELECT id FROM users WHERE username = ?", ('test_manager',)).fetchone()
-    
-    if existing:
-        print("Test users already exist. Updating passwords...")
-        # Update passwords
-        manager_hash = hash_password('TestPass123')
-        conn.execute("UPDATE users SET password_hash = ? WHERE username = ?", 
-                    (manager_hash, 'test_manager'))
-    else:
-        print("Creating test users...")
-        # Create test manager
-        manager_hash = hash_password('TestPass123')
-        conn.execute("""
-            INSERT INTO users (username, password_hash, role, is_active, force_password_change)
-            VALUES (?, ?, 'manager', 1, 0)
-        """, ('test_manager', manager_hash))
-    
-    # Check if test_user exists
-    existing = conn.execute("SELECT id FROM users WHERE username = ?", ('test_user',)).fetchone()
-    
-    if not existing:
-        # Create test front desk user
-        user_hash = hash_password('FrontDesk123')
-        conn.execute("""
-            INSERT INTO users (username, password_hash, role, is_active, force_password_change)
-            VALUES (?, ?, 'front_desk', 1, 0)
-        """, ('test_user', user_hash))
-    
-    conn.commit()
-    conn.close()
+    seed_users([
+        ('test_manager', 'TestPass123', 'manager'),
+        ('test_user', 'FrontDesk123', 'front_desk'),
+    ])
     
     print("✓ Test users ready:")
     print("  - test_manager / TestPass123 (manager)")
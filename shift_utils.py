@@ -3,7 +3,7 @@ Shift Utilities for DNR App.
 
 Handles shift definitions, time calculations, and locking logic.
 """
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
 import zoneinfo
 
 # Define Timezone
@@ -18,10 +18,27 @@ SHIFT_1_START = time(7, 0)
 SHIFT_2_START = time(15, 0)
 SHIFT_3_START = time(23, 0)
 
+# Shifts start on the hour, so the shift for any time is a lookup by hour.
+_SHIFT_BY_HOUR = tuple(
+    1 if SHIFT_1_START.hour <= h < SHIFT_2_START.hour else
+    2 if SHIFT_2_START.hour <= h < SHIFT_3_START.hour else
+    3
+    for h in range(24)
+)
+
 def get_current_time():
     """Get current time in app timezone."""
     return datetime.now(TIMEZONE)
 
+def _shift_for(current_dt):
+    """Return (shift_id, logical shift date) for a datetime in one pass."""
+    h = current_dt.hour
+    
+    if h < SHIFT_1_START.hour:
+        # After midnight: still the previous day's Shift 3
+        return 3, current_dt.date() - timedelta(days=1)
+    return _SHIFT_BY_HOUR[h], current_dt.date()
+
 def get_current_shift_id(current_dt=None):
     """
     Determine the current shift ID based on time.
@@ -35,15 +52,7 @@ def get_current_shift_id(current_dt=None):
     if current_dt is None:
         current_dt = get_current_time()
         
-    t = current_dt.time()
-    
-    if SHIFT_1_START <= t < SHIFT_2_START:
-        return 1
-    elif SHIFT_2_START <= t < SHIFT_3_START:
-        return 2
-    else:
-        # Shift 3 covers 23:00 to 07:00
-        return 3
+    return _shift_for(current_dt)[0]
 
 def get_shift_date(current_dt=None):
     """
@@ -62,15 +71,7 @@ def get_shift_date(current_dt=None):
     if current_dt is None:
         current_dt = get_current_time()
         
-    t = current_dt.time()
-    d = current_dt.date()
-    
-    # If it's after midnight but before start of Shift 1 (07:00), 
-    # it belongs to the previous day's Shift 3.
-    if t < SHIFT_1_START:
-        return d - timedelta(days=1)
-    
-    return d
+    return _shift_for(current_dt)[1]
 
 def is_shift_active(shift_id, shift_date, current_dt=None):
     """
@@ -94,13 +95,12 @@ def is_shift_active(shift_id, shift_date, current_dt=None):
             if "T" in shift_date:
                 shift_date = datetime.fromisoformat(shift_date).date()
             else:
-                shift_date = datetime.strptime(shift_date, "%Y-%m-%d").date()
+                shift_date = date.fromisoformat(shift_date)
         except ValueError:
             # If parsing fails or complex format, try to infer from timestamp
             # This fallback is riskier, better to pass clean dates.
             pass
 
-    current_shift = get_current_shift_id(current_dt)
-    current_shift_date = get_shift_date(current_dt)
+    current_shift, current_shift_date = _shift_for(current_dt)
     
     return (shift_id == current_shift) and (shift_date == current_shift_date)
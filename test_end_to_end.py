@@ -4,28 +4,47 @@ Tests: add/remove/modify records, authentication, CSRF
 """
 import os
 import sys
-import sqlite3
-import json
+import functools
 from datetime import date, timedelta
 
+# orjson is several times faster for the request/response payloads; fall back
+# to the standard library when it isn't installed
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import dumps as json_dumps, loads as json_loads
+
 # Set test environment BEFORE importing app
 os.environ['FLASK_ENV'] = 'testing'
-os.environ['DB_PATH'] = 'test_dnr.db'
+# Hash test credentials at bcrypt's minimum cost (4) instead of the default 12
+os.environ['DNR_TEST_BCRYPT_COST'] = '4'
+# Shared-cache in-memory database: no disk I/O, and every connection in this
+# process (including the app's per-request ones) sees the same data
+os.environ['DB_PATH'] = 'file:test_dnr?mode=memory&cache=shared'
 
 # Import app after environment setup
 from app import app, get_db_connection, hash_password, is_setup_required
 import init_db
 
+# Test credentials are hashed once per run
+MANAGER_PASSWORD_HASH = hash_password('TestPass123')
+FRONT_DESK_PASSWORD_HASH = hash_password('FrontDesk123')
+
+@functools.lru_cache(maxsize=1)
+def _conn():
+    """
+    Shared connection for setup and verification reads, opened once per run.
+    An in-memory database is dropped when its last connection closes, so this
+    one also keeps the test database alive until cleanup_test_db().
+    """
+    return get_db_connection()
+
 def setup_test_db():
     """Create a clean test database with a test user"""
     db_path = os.environ.get('DB_PATH')
     
-    # Remove existing test db
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-        except PermissionError:
-            pass  # Will be replaced
+    # Open the anchor connection before the schema is built
+    conn = _conn()
     
     # Save original DB_PATH and replace
     original_db_path = init_db.DB_PATH
@@ -39,29 +58,48 @@ def setup_test_db():
         init_db.DB_PATH = original_db_path
     
     # Add test users
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Insert test manager user
-    password_hash = hash_password('TestPass123')
-    cursor.execute("""
-        INSERT INTO users (username, password_hash, role, is_active, force_password_change)
-        VALUES (?, ?, 'manager', 1, 0)
-    """, ('test_manager', password_hash))
-    
-    # Insert test front_desk user
-    password_hash2 = hash_password('FrontDesk123')
-    cursor.execute("""
+    conn.executemany("""
         INSERT INTO users (username, password_hash, role, is_active, force_password_change)
-        VALUES (?, ?, 'front_desk', 1, 0)
-    """, ('test_user', password_hash2))
+        VALUES (?, ?, ?, 1, 0)
+    """, [
+        ('test_manager', MANAGER_PASSWORD_HASH, 'manager'),
+        ('test_user', FRONT_DESK_PASSWORD_HASH, 'front_desk'),
+    ])
     
     conn.commit()
-    conn.close()
     
     print("✓ Test database created successfully")
 
+def verify_record(record_id, **expected):
+    """Assert that a record's columns hold the expected values, fetching only those columns"""
+    record = _conn().execute(
+        f"SELECT {', '.join(expected)} FROM records WHERE id = ?", (record_id,)
+    ).fetchone()
+    
+    assert record is not None, "Record not found in database"
+    for column, value in expected.items():
+        assert record[column] == value, f"{column} mismatch: expected {value!r}, got {record[column]!r}"
+
+def make_record_directly(guest_name, ban_type='permanent'):
+    """Insert an active record straight into the database and return its id"""
+    conn = _conn()
+    cursor = conn.execute("""
+        INSERT INTO records (guest_name, status, ban_type, reasons, date_added)
+        VALUES (?, 'active', ?, '["Noise complaints multiple incidents"]', ?)
+    """, (guest_name, ban_type, str(date.today())))
+    conn.commit()
+    return cursor.lastrowid
+
+def login_client(username, password):
+    """Return a test client that is already logged in as the given user"""
+    client = app.test_client()
+    response = client.post('/login', data={
+        'username': username,
+        'password': password
+    })
+    assert response.status_code == 302, f"Login as {username} failed: {response.status_code}"
+    return client
+
 def test_setup_required():
     """Test is_setup_required function"""
     print("\n[TEST] is_setup_required() function")
@@ -90,243 +128,173 @@ def test_authentication():
         assert response.status_code == 200, f"Expected 200, got {response.status_code}"
         print("✓ Access to protected route successful")
 
-def test_csrf_token():
+def test_csrf_token(client):
     """Test CSRF token endpoint"""
     print("\n[TEST] CSRF Token")
     
-    with app.test_client() as client:
-        # Login first
-        client.post('/login', data={
-            'username': 'test_manager',
-            'password': 'TestPass123'
-        })
-        
-        # Get CSRF token
-        response = client.get('/api/csrf-token')
-        assert response.status_code == 200, f"Expected 200, got {response.status_code}"
-        
-        data = json.loads(response.data)
-        assert 'csrf_token' in data, "CSRF token not in response"
-        assert data['csrf_token'] is not None, "CSRF token is None"
-        print("✓ CSRF token endpoint working")
+    # Get CSRF token
+    response = client.get('/api/csrf-token')
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    
+    data = json_loads(response.data)
+    assert 'csrf_token' in data, "CSRF token not in response"
+    assert data['csrf_token'] is not None, "CSRF token is None"
+    print("✓ CSRF token endpoint working")
 
-def test_add_dnr_record():
+def test_add_dnr_record(client):
     """Test adding a DNR record"""
     print("\n[TEST] Add DNR Record")
     
-    with app.test_client() as client:
-        # Login
-        client.post('/login', data={
-            'username': 'test_manager',
-            'password': 'TestPass123'
-        })
-        
-        # Add record
-        record_data = {
-            'guest_name': 'John Test Doe',
-            'ban_type': 'permanent',
-            'reasons': ['Damage under review', 'Noise complaints multiple incidents'],
-            'reason_detail': 'Broke TV and disturbed other guests',
-            'staff_initials': 'TM',
-            'incident_date': str(date.today())
-        }
-        
-        response = client.post('/api/records',
-            data=json.dumps(record_data),
-            content_type='application/json',
-            headers={'X-CSRFToken': 'test-token'}
-        )
-        
-        assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.data}"
-        
-        data = json.loads(response.data)
-        assert 'id' in data, "Record ID not returned"
-        record_id = data['id']
-        print(f"✓ Record added successfully (ID: {record_id})")
-        
-        # Verify in database
-        conn = get_db_connection()
-        record = conn.execute("SELECT * FROM records WHERE id = ?", (record_id,)).fetchone()
-        conn.close()
-        
-        assert record is not None, "Record not found in database"
-        assert record['guest_name'] == 'John Test Doe', "Guest name mismatch"
-        assert record['status'] == 'active', "Status should be active"
-        print("✓ Record verified in database")
-        
-        return record_id
+    # Add record
+    record_data = {
+        'guest_name': 'John Test Doe',
+        'ban_type': 'permanent',
+        'reasons': ['Damage under review', 'Noise complaints multiple incidents'],
+        'reason_detail': 'Broke TV and disturbed other guests',
+        'staff_initials': 'TM',
+        'incident_date': str(date.today())
+    }
+    
+    response = client.post('/api/records',
+        data=json_dumps(record_data),
+        content_type='application/json',
+        headers={'X-CSRFToken': 'test-token'}
+    )
+    
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.data}"
+    
+    data = json_loads(response.data)
+    assert 'id' in data, "Record ID not returned"
+    record_id = data['id']
+    print(f"✓ Record added successfully (ID: {record_id})")
+    
+    # Verify in database
+    verify_record(record_id, guest_name='John Test Doe', status='active')
+    print("✓ Record verified in database")
+    
+    return record_id
 
-def test_add_timeline_entry(record_id):
+def test_add_timeline_entry(client, record_id):
     """Test adding timeline entry to a record"""
     print("\n[TEST] Add Timeline Entry")
     
-    with app.test_client() as client:
-        # Login
-        client.post('/login', data={
-            'username': 'test_manager',
-            'password': 'TestPass123'
-        })
-        
-        # Add timeline entry
-        timeline_data = {
-            'note': 'Guest called to apologize',
-            'staff_initials': 'TM'
-        }
-        
-        response = client.post(f'/api/records/{record_id}/timeline',
-            data=json.dumps(timeline_data),
-            content_type='application/json',
-            headers={'X-CSRFToken': 'test-token'}
-        )
-        
-        assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.data}"
-        print("✓ Timeline entry added successfully")
-        
-        # Verify in database
-        conn = get_db_connection()
-        count = conn.execute(
-            "SELECT COUNT(*) as cnt FROM timeline_entries WHERE record_id = ? AND is_system = 0",
-            (record_id,)
-        ).fetchone()['cnt']
-        conn.close()
-        
-        assert count >= 1, "Timeline entry not found in database"
-        print("✓ Timeline entry verified in database")
+    # Add timeline entry
+    timeline_data = {
+        'note': 'Guest called to apologize',
+        'staff_initials': 'TM'
+    }
+    
+    response = client.post(f'/api/records/{record_id}/timeline',
+        data=json_dumps(timeline_data),
+        content_type='application/json',
+        headers={'X-CSRFToken': 'test-token'}
+    )
+    
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.data}"
+    print("✓ Timeline entry added successfully")
+    
+    # Verify in database
+    conn = _conn()
+    count = conn.execute(
+        "SELECT COUNT(*) as cnt FROM timeline_entries WHERE record_id = ? AND is_system = 0",
+        (record_id,)
+    ).fetchone()['cnt']
+    
+    assert count >= 1, "Timeline entry not found in database"
+    print("✓ Timeline entry verified in database")
 
-def test_get_record(record_id):
+def test_get_record(client, record_id):
     """Test retrieving a record"""
     print("\n[TEST] Get DNR Record")
     
-    with app.test_client() as client:
-        # Login
-        client.post('/login', data={
-            'username': 'test_manager',
-            'password': 'TestPass123'
-        })
-        
-        response = client.get(f'/api/records/{record_id}')
-        assert response.status_code == 200, f"Expected 200, got {response.status_code}"
-        
-        data = json.loads(response.data)
-        assert data['id'] == record_id, "Record ID mismatch"
-        assert data['guest_name'] == 'John Test Doe', "Guest name mismatch"
-        assert len(data['timeline']) >= 2, "Timeline should have entries"
-        print("✓ Record retrieved successfully")
+    response = client.get(f'/api/records/{record_id}')
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    
+    data = json_loads(response.data)
+    assert data['id'] == record_id, "Record ID mismatch"
+    assert data['guest_name'] == 'John Test Doe', "Guest name mismatch"
+    assert len(data['timeline']) >= 2, "Timeline should have entries"
+    print("✓ Record retrieved successfully")
 
-def test_list_records():
+def test_list_records(client):
     """Test listing all records"""
     print("\n[TEST] List DNR Records")
     
-    with app.test_client() as client:
-        # Login
-        client.post('/login', data={
-            'username': 'test_manager',
-            'password': 'TestPass123'
-        })
-        
-        response = client.get('/api/records')
-        assert response.status_code == 200, f"Expected 200, got {response.status_code}"
-        
-        data = json.loads(response.data)
-        assert isinstance(data, list), "Response should be a list"
-        assert len(data) >= 1, "Should have at least one record"
-        print(f"✓ Listed {len(data)} record(s)")
+    response = client.get('/api/records')
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    
+    data = json_loads(response.data)
+    assert isinstance(data, list), "Response should be a list"
+    assert len(data) >= 1, "Should have at least one record"
+    print(f"✓ Listed {len(data)} record(s)")
 
-def test_lift_ban(record_id):
+def test_lift_ban(client):
     """Test lifting a ban"""
     print("\n[TEST] Lift DNR Ban")
     
-    with app.test_client() as client:
-        # Login
-        client.post('/login', data={
-            'username': 'test_manager',
-            'password': 'TestPass123'
-        })
-        
-        # Lift ban
-        lift_data = {
-            'password': 'TestPass123',
-            'lift_type': 'manager_override',
-            'lift_reason': 'Test: Verified guest identity was mistaken',
-            'initials': 'TM'
-        }
-        
-        response = client.post(f'/api/records/{record_id}/lift',
-            data=json.dumps(lift_data),
-            content_type='application/json',
-            headers={'X-CSRFToken': 'test-token'}
-        )
-        
-        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.data}"
-        print("✓ Ban lifted successfully")
-        
-        # Verify in database
-        conn = get_db_connection()
-        record = conn.execute("SELECT * FROM records WHERE id = ?", (record_id,)).fetchone()
-        conn.close()
-        
-        assert record['status'] == 'lifted', "Status should be lifted"
-        assert record['lifted_type'] == 'manager_override', "Lift type mismatch"
-        assert record['lifted_initials'] == 'TM', "Initials mismatch"
-        print("✓ Ban lift verified in database")
+    # Only the lift endpoint is under test, so create the record directly
+    record_id = make_record_directly('Lift Test Guest')
+    
+    # Lift ban
+    lift_data = {
+        'password': 'TestPass123',
+        'lift_type': 'manager_override',
+        'lift_reason': 'Test: Verified guest identity was mistaken',
+        'initials': 'TM'
+    }
+    
+    response = client.post(f'/api/records/{record_id}/lift',
+        data=json_dumps(lift_data),
+        content_type='application/json',
+        headers={'X-CSRFToken': 'test-token'}
+    )
+    
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.data}"
+    print("✓ Ban lifted successfully")
+    
+    # Verify in database
+    verify_record(record_id, status='lifted', lifted_type='manager_override', lifted_initials='TM')
+    print("✓ Ban lift verified in database")
 
-def test_temporary_ban_with_expiration():
+def test_temporary_ban_with_expiration(client):
     """Test adding temporary ban with expiration date"""
     print("\n[TEST] Add Temporary Ban with Expiration")
     
-    with app.test_client() as client:
-        # Login
-        client.post('/login', data={
-            'username': 'test_user',
-            'password': 'FrontDesk123'
-        })
-        
-        # Add temporary ban
-        expiration = str(date.today() + timedelta(days=30))
-        record_data = {
-            'guest_name': 'Jane Temporary',
-            'ban_type': 'temporary',
-            'reasons': ['Smoking in non smoking room'],
-            'reason_detail': '30-day ban for policy violation',
-            'staff_initials': 'TU',
-            'incident_date': str(date.today()),
-            'expiration_type': 'date',
-            'expiration_date': expiration
-        }
-        
-        response = client.post('/api/records',
-            data=json.dumps(record_data),
-            content_type='application/json',
-            headers={'X-CSRFToken': 'test-token'}
-        )
-        
-        assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.data}"
-        
-        data = json.loads(response.data)
-        record_id = data['id']
-        print(f"✓ Temporary ban added (ID: {record_id})")
-        
-        # Verify in database
-        conn = get_db_connection()
-        record = conn.execute("SELECT * FROM records WHERE id = ?", (record_id,)).fetchone()
-        conn.close()
-        
-        assert record['ban_type'] == 'temporary', "Ban type should be temporary"
-        assert record['expiration_date'] == expiration, "Expiration date mismatch"
-        print("✓ Temporary ban verified in database")
+    # Add temporary ban
+    expiration = str(date.today() + timedelta(days=30))
+    record_data = {
+        'guest_name': 'Jane Temporary',
+        'ban_type': 'temporary',
+        'reasons': ['Smoking in non smoking room'],
+        'reason_detail': '30-day ban for policy violation',
+        'staff_initials': 'TU',
+        'incident_date': str(date.today()),
+        'expiration_type': 'date',
+        'expiration_date': expiration
+    }
+    
+    response = client.post('/api/records',
+        data=json_dumps(record_data),
+        content_type='application/json',
+        headers={'X-CSRFToken': 'test-token'}
+    )
+    
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}: {response.data}"
+    
+    data = json_loads(response.data)
+    record_id = data['id']
+    print(f"✓ Temporary ban added (ID: {record_id})")
+    
+    # Verify in database
+    verify_record(record_id, ban_type='temporary', expiration_date=expiration)
+    print("✓ Temporary ban verified in database")
 
 def cleanup_test_db():
-    """Remove test database"""
-    db_path = os.environ.get('DB_PATH')
-    if os.path.exists(db_path):
-        # Give time for connections to close
-        import time
-        time.sleep(0.5)
-        try:
-            os.remove(db_path)
-            print("\n✓ Test database cleaned up")
-        except PermissionError:
-            print("\n⚠ Warning: Could not delete test database (still in use)")
+    """Drop the in-memory test database by closing its last connection"""
+    if _conn.cache_info().currsize:
+        _conn().close()
+        _conn.cache_clear()
+    print("\n✓ Test database cleaned up")
 
 def run_all_tests():
     """Run all end-to-end tests"""
@@ -341,15 +309,20 @@ def run_all_tests():
         # Core tests
         test_setup_required()
         test_authentication()
-        test_csrf_token()
+        
+        # Log in once per role; the remaining tests share these sessions
+        manager = login_client('test_manager', 'TestPass123')
+        front_desk = login_client('test_user', 'FrontDesk123')
+        
+        test_csrf_token(manager)
         
         # DNR record tests
-        record_id = test_add_dnr_record()
-        test_add_timeline_entry(record_id)
-        test_get_record(record_id)
-        test_list_records()
-        test_lift_ban(record_id)
-        test_temporary_ban_with_expiration()
+        record_id = test_add_dnr_record(manager)
+        test_add_timeline_entry(manager, record_id)
+        test_get_record(manager, record_id)
+        test_list_records(manager)
+        test_lift_ban(manager)
+        test_temporary_ban_with_expiration(front_desk)
         
         # Success
         print("\n" + "=" * 60)
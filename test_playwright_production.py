@@ -2,11 +2,11 @@
 Playwright End-to-End Tests for DNR App Production Environment
 Tests all major functionality including authentication, CRUD operations, and navigation.
 """
+import os
 import pytest
 import re
-import time
 from datetime import date, timedelta
-from playwright.sync_api import Page, expect
+from playwright.sync_api import APIRequestContext, Browser, Page, Playwright, expect
 
 # Configuration
 BASE_URL = "http://localhost:5000"  # Change to production URL if needed
@@ -18,12 +18,20 @@ MANAGER_PASSWORD = "TestPass123"
 FRONT_DESK_USERNAME = "test_user"  
 FRONT_DESK_PASSWORD = "FrontDesk123"
 
+# Headless with no slow-mo by default; set HEADED=1 (and optionally SLOW_MO=500)
+# to watch a run
+HEADED = os.environ.get("HEADED") == "1"
+SLOW_MO = int(os.environ.get("SLOW_MO", "0"))
 
-@pytest.fixture(scope="function")
-def authenticated_page(page: Page):
-    """Fixture that provides an authenticated page session"""
+# Under pytest-xdist each worker writes to the same database, so records
+# created by tests carry the worker id to keep them apart
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER", "main")
+TEST_GUEST_NAME = f"Playwright Test User {XDIST_WORKER}"
+
+
+def login(page: Page):
+    """Log the page in as the test manager and wait for the overview"""
     page.goto(BASE_URL)
-    page.wait_for_load_state("networkidle")
     
     # Login
     page.fill('input[name="username"]', MANAGER_USERNAME)
@@ -32,8 +40,82 @@ def authenticated_page(page: Page):
     
     # Wait for redirect to overview
     page.wait_for_url(f"{BASE_URL}/overview", timeout=TEST_TIMEOUT)
-    
-    return page
+
+
+def wait_for_records(page: Page):
+    """Wait for the DNR list to replace its loading spinner with results"""
+    expect(page.locator('#recordsList .loading')).to_have_count(0)
+
+
+def new_context(browser: Browser, browser_context_args, storage_state=None):
+    """Open a browser context that skips image and font downloads"""
+    context = browser.new_context(**browser_context_args, storage_state=storage_state)
+    # Tests assert on text and form controls only; stylesheets still load
+    # since visibility checks depend on them
+    context.route("**/*.{png,jpg,jpeg,gif,svg,ico,woff,woff2}", lambda route: route.abort())
+    return context
+
+
+@pytest.fixture(scope="session")
+def auth_state(browser: Browser, browser_context_args):
+    """Log in once and return the storage state (session cookie) to reuse"""
+    context = new_context(browser, browser_context_args)
+    page = context.new_page()
+    login(page)
+    state = context.storage_state()
+    context.close()
+    return state
+
+
+@pytest.fixture(scope="session")
+def authenticated_page(browser: Browser, browser_context_args, auth_state):
+    """
+    Authenticated page shared by the whole session.
+
+    Logging in once saves a context launch and a server-side bcrypt check
+    per test. Tests that end the session or change page state that later
+    tests depend on (logout, viewport) use fresh_page instead.
+    """
+    context = new_context(browser, browser_context_args, auth_state)
+    page = context.new_page()
+    page.goto(f"{BASE_URL}/overview")
+
+    yield page
+
+    context.close()
+
+
+@pytest.fixture(scope="session")
+def api_client(playwright: Playwright, auth_state):
+    """
+    Logged-in HTTP client for tests that only check API responses.
+
+    Shares the saved session cookie but never opens a page, so endpoint
+    checks skip browser rendering entirely.
+    """
+    context = playwright.request.new_context(base_url=BASE_URL, storage_state=auth_state)
+
+    yield context
+
+    context.dispose()
+
+
+@pytest.fixture(scope="function")
+def fresh_page(browser: Browser, browser_context_args, auth_state):
+    """
+    Separately authenticated page for one test.
+
+    The context starts from the saved login state instead of repeating the
+    login form. Logging out only clears that context's cookie, so the state
+    stays valid for later tests.
+    """
+    context = new_context(browser, browser_context_args, auth_state)
+    page = context.new_page()
+    page.goto(f"{BASE_URL}/overview")
+
+    yield page
+
+    context.close()
 
 
 class TestAuthentication:
@@ -71,14 +153,14 @@ class TestAuthentication:
         expect(page.locator('text=/invalid|incorrect/i')).to_be_visible(timeout=5000)
         print("✓ Invalid login correctly rejected")
     
-    def test_logout(self, authenticated_page: Page):
+    def test_logout(self, fresh_page: Page):
         """Test logout functionality"""
         # Find and click logout
-        authenticated_page.click('a[href="/logout"]')
+        fresh_page.click('a[href="/logout"]')
         
         # Should redirect to login
-        authenticated_page.wait_for_url(f"{BASE_URL}/login", timeout=TEST_TIMEOUT)
-        expect(authenticated_page).to_have_url(re.compile("/login"))
+        fresh_page.wait_for_url(f"{BASE_URL}/login", timeout=TEST_TIMEOUT)
+        expect(fresh_page).to_have_url(re.compile("/login"))
         print("✓ Logout successful")
 
 
@@ -88,7 +170,6 @@ class TestNavigation:
     def test_overview_page(self, authenticated_page: Page):
         """Test overview/dashboard page"""
         authenticated_page.goto(f"{BASE_URL}/overview")
-        authenticated_page.wait_for_load_state("networkidle")
         
         # Should show overview content
         expect(authenticated_page.locator('text=/overview|dashboard/i')).to_be_visible()
@@ -97,7 +178,7 @@ class TestNavigation:
     def test_dnr_list_page(self, authenticated_page: Page):
         """Test DNR list page loads"""
         authenticated_page.goto(f"{BASE_URL}/dnr")
-        authenticated_page.wait_for_load_state("networkidle")
+        wait_for_records(authenticated_page)
         
         # Should show DNR interface
         expect(authenticated_page.locator('text=/do not rent|dnr|restricted/i')).to_be_visible()
@@ -106,7 +187,6 @@ class TestNavigation:
     def test_schedule_page(self, authenticated_page: Page):
         """Test schedule page loads"""
         authenticated_page.goto(f"{BASE_URL}/schedule")
-        authenticated_page.wait_for_load_state("networkidle")
         
         # Should show schedule
         expect(authenticated_page.locator('text=/schedule|shift/i')).to_be_visible()
@@ -115,7 +195,6 @@ class TestNavigation:
     def test_settings_page(self, authenticated_page: Page):
         """Test settings page loads (manager only)"""
         authenticated_page.goto(f"{BASE_URL}/settings")
-        authenticated_page.wait_for_load_state("networkidle")
         
         # Should show settings
         expect(authenticated_page.locator('text=/settings|users|account/i')).to_be_visible()
@@ -128,7 +207,7 @@ class TestDNROperations:
     def test_add_dnr_record(self, authenticated_page: Page):
         """Test adding a new DNR record"""
         authenticated_page.goto(f"{BASE_URL}/dnr")
-        authenticated_page.wait_for_load_state("networkidle")
+        wait_for_records(authenticated_page)
         
         # Click add button
         authenticated_page.click('button:has-text("Add")')
@@ -137,7 +216,7 @@ class TestDNROperations:
         authenticated_page.wait_for_selector('[role="dialog"], .modal', timeout=5000)
         
         # Fill in form
-        authenticated_page.fill('input[name="guest_name"]', 'Playwright Test User')
+        authenticated_page.fill('input[name="guest_name"]', TEST_GUEST_NAME)
         
         # Select permanent ban
         authenticated_page.click('input[value="permanent"]')
@@ -148,20 +227,21 @@ class TestDNROperations:
         # Fill initials
         authenticated_page.fill('input[name="staff_initials"]', 'PT')
         
-        # Submit form
-        authenticated_page.click('button[type="submit"]:has-text("Add")')
-        
-        # Wait for success toast or modal to close
-        time.sleep(2)  # Give time for request to process
+        # Submit form and wait for the create request to finish
+        with authenticated_page.expect_response(
+            lambda r: r.url.endswith('/api/records') and r.request.method == 'POST'
+        ) as response_info:
+            authenticated_page.click('button[type="submit"]:has-text("Add")')
+        assert response_info.value.ok, "Creating the record should succeed"
         
         # Verify record appears in list
-        authenticated_page.wait_for_selector('text=Playwright Test User', timeout=10000)
+        authenticated_page.wait_for_selector(f'text={TEST_GUEST_NAME}', timeout=10000)
         print("✓ DNR record added successfully")
     
     def test_view_dnr_record(self, authenticated_page: Page):
         """Test viewing a DNR record detail"""
         authenticated_page.goto(f"{BASE_URL}/dnr")
-        authenticated_page.wait_for_load_state("networkidle")
+        wait_for_records(authenticated_page)
         
         # Click on first record
         record = authenticated_page.locator('.record-item, tr[data-id]').first
@@ -180,7 +260,7 @@ class TestDNROperations:
     def test_add_timeline_note(self, authenticated_page: Page):
         """Test adding a timeline note to a record"""
         authenticated_page.goto(f"{BASE_URL}/dnr")
-        authenticated_page.wait_for_load_state("networkidle")
+        wait_for_records(authenticated_page)
         
         # Click on first record
         record = authenticated_page.locator('.record-item, tr[data-id]').first
@@ -200,9 +280,12 @@ class TestDNROperations:
                 if initials_input.count() > 0:
                     initials_input.fill('PT')
                 
-                # Submit
-                authenticated_page.click('button:has-text("Add Note")')
-                time.sleep(2)
+                # Submit and wait for the timeline request to finish
+                with authenticated_page.expect_response(
+                    lambda r: '/timeline' in r.url and r.request.method == 'POST'
+                ) as response_info:
+                    authenticated_page.click('button:has-text("Add Note")')
+                assert response_info.value.ok, "Adding the note should succeed"
                 
                 print("✓ Timeline note added successfully")
             else:
@@ -213,7 +296,7 @@ class TestDNROperations:
     def test_lift_ban(self, authenticated_page: Page):
         """Test lifting a ban (manager function)"""
         authenticated_page.goto(f"{BASE_URL}/dnr")
-        authenticated_page.wait_for_load_state("networkidle")
+        wait_for_records(authenticated_page)
         
         # Find an active record
         record = authenticated_page.locator('.record-item, tr[data-id]').first
@@ -228,16 +311,18 @@ class TestDNROperations:
             if lift_button.count() > 0:
                 lift_button.click()
                 
-                # Fill lift form
-                time.sleep(1)
+                # Fill lift form (fill waits for the form to appear)
                 authenticated_page.fill('input[type="password"]', MANAGER_PASSWORD)
                 authenticated_page.select_option('select[name="lift_type"]', 'manager_override')
                 authenticated_page.fill('textarea[name="lift_reason"]', 'Playwright test - automated ban removal')
                 authenticated_page.fill('input[name="initials"]', 'PT')
                 
-                # Submit
-                authenticated_page.click('button[type="submit"]:has-text("Lift")')
-                time.sleep(2)
+                # Submit and wait for the lift request to finish
+                with authenticated_page.expect_response(
+                    lambda r: '/lift' in r.url and r.request.method == 'POST'
+                ) as response_info:
+                    authenticated_page.click('button[type="submit"]:has-text("Lift")')
+                assert response_info.value.ok, "Lifting the ban should succeed"
                 
                 print("✓ Ban lifted successfully")
             else:
@@ -249,9 +334,9 @@ class TestDNROperations:
 class TestCSRFProtection:
     """Test CSRF token functionality"""
     
-    def test_csrf_token_endpoint(self, authenticated_page: Page):
+    def test_csrf_token_endpoint(self, api_client: APIRequestContext):
         """Test CSRF token API endpoint"""
-        response = authenticated_page.request.get(f"{BASE_URL}/api/csrf-token")
+        response = api_client.get("/api/csrf-token")
         assert response.ok, "CSRF token endpoint should return 200"
         
         data = response.json()
@@ -262,7 +347,7 @@ class TestCSRFProtection:
     def test_csrf_token_in_requests(self, authenticated_page: Page):
         """Verify CSRF tokens are included in API requests"""
         authenticated_page.goto(f"{BASE_URL}/dnr")
-        authenticated_page.wait_for_load_state("networkidle")
+        wait_for_records(authenticated_page)
         
         # Check that page has CSRF token
         csrf_token = authenticated_page.evaluate("""
@@ -282,24 +367,22 @@ class TestCSRFProtection:
 class TestResponsiveness:
     """Test responsive design and mobile views"""
     
-    def test_mobile_viewport(self, authenticated_page: Page):
+    def test_mobile_viewport(self, fresh_page: Page):
         """Test mobile viewport rendering"""
-        authenticated_page.set_viewport_size({"width": 375, "height": 667})
-        authenticated_page.goto(f"{BASE_URL}/overview")
-        authenticated_page.wait_for_load_state("networkidle")
+        fresh_page.set_viewport_size({"width": 375, "height": 667})
+        fresh_page.goto(f"{BASE_URL}/overview")
         
         # Page should still be functional
-        expect(authenticated_page.locator('body')).to_be_visible()
+        expect(fresh_page.locator('body')).to_be_visible()
         print("✓ Mobile viewport renders correctly")
     
-    def test_tablet_viewport(self, authenticated_page: Page):
+    def test_tablet_viewport(self, fresh_page: Page):
         """Test tablet viewport rendering"""
-        authenticated_page.set_viewport_size({"width": 768, "height": 1024})
-        authenticated_page.goto(f"{BASE_URL}/overview")
-        authenticated_page.wait_for_load_state("networkidle")
+        fresh_page.set_viewport_size({"width": 768, "height": 1024})
+        fresh_page.goto(f"{BASE_URL}/overview")
         
         # Page should still be functional
-        expect(authenticated_page.locator('body')).to_be_visible()
+        expect(fresh_page.locator('body')).to_be_visible()
         print("✓ Tablet viewport renders correctly")
 
 
@@ -327,21 +410,21 @@ class TestErrorHandling:
 
 def run_all_tests():
     """Run all Playwright tests"""
-    import subprocess
-    
     print("=" * 70)
     print("DNR APP - PLAYWRIGHT PRODUCTION TESTS")
     print("=" * 70)
     print(f"Testing URL: {BASE_URL}")
     print("=" * 70)
     
-    # Run pytest with playwright
-    result = subprocess.run(
-        ["pytest", __file__, "-v", "--headed", "--slowmo=500"],
-        capture_output=False
-    )
+    # Run pytest in-process, one worker per core; --dist=loadscope keeps
+    # each test class on a single worker
+    args = [__file__, "-v", "-n", "auto", "--dist=loadscope"]
+    if HEADED:
+        args.append("--headed")
+    if SLOW_MO:
+        args.append(f"--slowmo={SLOW_MO}")
     
-    return result.returncode == 0
+    return pytest.main(args) == 0
 
 
 if __name__ == "__main__":
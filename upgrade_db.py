@@ -11,31 +11,50 @@ from pathlib import Path
 
 DB_PATH = Path(__file__).with_name("dnr.db")
 
+# Stored in PRAGMA user_version once the schema steps have run. Bump it
+# whenever an ensure_* function changes so existing databases re-migrate.
+SCHEMA_VERSION = 4
+
 
 # --- helpers ---------------------------------------------------------------
 
 def connect():
     conn = sqlite3.connect(DB_PATH)
     conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -16000")
     return conn
 
 
 def table_exists(cur, name: str) -> bool:
     row = cur.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1",
         (name,),
     ).fetchone()
     return row is not None
 
 
+def table_columns(cur, table: str) -> set:
+    """Column names of a table, read with a single PRAGMA table_info."""
+    return {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+
+
 def column_exists(cur, table: str, column: str) -> bool:
-    cur.execute(f"PRAGMA table_info({table})")
-    return column in [row[1] for row in cur.fetchall()]
+    return column in table_columns(cur, table)
+
+
+def add_column(cur, table: str, column_ddl: str):
+    """Add a column, treating SQLite's "duplicate column" error as already migrated."""
+    try:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column_ddl}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" not in str(e):
+            raise
 
 
 def index_exists(cur, name: str) -> bool:
     row = cur.execute(
-        "SELECT name FROM sqlite_master WHERE type='index' AND name=?",
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name=? LIMIT 1",
         (name,),
     ).fetchone()
     return row is not None
@@ -73,9 +92,6 @@ def ensure_login_attempts(cur):
         )
         """
     )
-    cur.execute(
-        "CREATE UNIQUE INDEX IF NOT EXISTS idx_login_attempts_username ON login_attempts(username)"
-    )
 
 
 def ensure_log_tables(cur):
@@ -112,15 +128,7 @@ def ensure_log_tables(cur):
         """
     )
 
-    if not column_exists(cur, "log_entries", "shift_id"):
-        cur.execute(
-            "ALTER TABLE log_entries ADD COLUMN shift_id INTEGER CHECK(shift_id IN (1,2,3))"
-        )
-
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_log_entries_created_at ON log_entries(created_at)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_log_entries_record ON log_entries(related_record_id)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_log_entries_maintenance ON log_entries(related_maintenance_id)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_status ON maintenance_items(status)")
+    add_column(cur, "log_entries", "shift_id INTEGER CHECK(shift_id IN (1,2,3))")
 
 
 def ensure_records_core(cur):
@@ -187,10 +195,11 @@ def ensure_supporting_tables(cur):
         )
         """
     )
-    if not column_exists(cur, "room_issues", "issue_type"):
-        cur.execute(
-            "ALTER TABLE room_issues ADD COLUMN issue_type TEXT CHECK(issue_type IN ('Hot Water','HVAC','Plumbing','Other')) DEFAULT 'Other'"
-        )
+    add_column(
+        cur,
+        "room_issues",
+        "issue_type TEXT CHECK(issue_type IN ('Hot Water','HVAC','Plumbing','Other')) DEFAULT 'Other'",
+    )
 
     cur.execute(
         """
@@ -229,10 +238,8 @@ def ensure_supporting_tables(cur):
         )
         """
     )
-    if not column_exists(cur, "how_to_guides", "filename"):
-        cur.execute("ALTER TABLE how_to_guides ADD COLUMN filename TEXT")
-    if not column_exists(cur, "how_to_guides", "original_filename"):
-        cur.execute("ALTER TABLE how_to_guides ADD COLUMN original_filename TEXT")
+    add_column(cur, "how_to_guides", "filename TEXT")
+    add_column(cur, "how_to_guides", "original_filename TEXT")
 
     cur.execute(
         """
@@ -246,10 +253,8 @@ def ensure_supporting_tables(cur):
         )
         """
     )
-    if not column_exists(cur, "checklist_templates", "filename"):
-        cur.execute("ALTER TABLE checklist_templates ADD COLUMN filename TEXT")
-    if not column_exists(cur, "checklist_templates", "original_filename"):
-        cur.execute("ALTER TABLE checklist_templates ADD COLUMN original_filename TEXT")
+    add_column(cur, "checklist_templates", "filename TEXT")
+    add_column(cur, "checklist_templates", "original_filename TEXT")
 
     cur.execute(
         """
@@ -281,11 +286,11 @@ def ensure_in_house_messages(cur):
         )
         """
     )
-    if not column_exists(cur, "in_house_messages", "archived"):
-        cur.execute("ALTER TABLE in_house_messages ADD COLUMN archived INTEGER DEFAULT 0")
-    if not column_exists(cur, "in_house_messages", "archived_at"):
-        cur.execute("ALTER TABLE in_house_messages ADD COLUMN archived_at TEXT")
+    add_column(cur, "in_house_messages", "archived INTEGER DEFAULT 0")
+    add_column(cur, "in_house_messages", "archived_at TEXT")
+
 
+def archive_expired_messages(cur):
     now = datetime.now(timezone.utc).isoformat(sep=" ", timespec="seconds")
     cur.execute(
         """
@@ -317,16 +322,18 @@ def ensure_housekeeping(cur):
         )
         """
     )
-    if not column_exists(cur, "housekeeping_requests", "guest_name"):
-        cur.execute("ALTER TABLE housekeeping_requests ADD COLUMN guest_name TEXT")
-    if not column_exists(cur, "housekeeping_requests", "frequency_days"):
-        cur.execute("ALTER TABLE housekeeping_requests ADD COLUMN frequency_days INTEGER")
+    add_column(cur, "housekeeping_requests", "guest_name TEXT")
+    add_column(cur, "housekeeping_requests", "frequency_days INTEGER")
 
     # housekeeping_service_dates with correct FK name
     if table_exists(cur, "housekeeping_service_dates"):
-        has_request_id = column_exists(cur, "housekeeping_service_dates", "request_id")
-        has_hk_request_id = column_exists(cur, "housekeeping_service_dates", "housekeeping_request_id")
+        columns = table_columns(cur, "housekeeping_service_dates")
+        has_request_id = "request_id" in columns
+        has_hk_request_id = "housekeeping_request_id" in columns
         if has_request_id and not has_hk_request_id:
+            # foreign_keys can't be toggled inside main()'s transaction, but
+            # deferring checks them once at commit instead of per copied row.
+            cur.execute("PRAGMA defer_foreign_keys = ON")
             cur.execute("ALTER TABLE housekeeping_service_dates RENAME TO housekeeping_service_dates_old")
             cur.execute(
                 """
@@ -366,13 +373,6 @@ def ensure_housekeeping(cur):
             """
         )
 
-    cur.execute(
-        "CREATE INDEX IF NOT EXISTS idx_housekeeping_service_dates_request ON housekeeping_service_dates(housekeeping_request_id)"
-    )
-    cur.execute(
-        "CREATE INDEX IF NOT EXISTS idx_housekeeping_service_dates_date ON housekeeping_service_dates(service_date, is_active)"
-    )
-
 
 def ensure_schedule(cur):
     cur.execute(
@@ -394,24 +394,19 @@ def ensure_schedule(cur):
         """
     )
 
-    for col, ddl in [
-        ("shift_time", "ALTER TABLE schedules ADD COLUMN shift_time TEXT"),
-        ("department", "ALTER TABLE schedules ADD COLUMN department TEXT"),
-        ("phone_number", "ALTER TABLE schedules ADD COLUMN phone_number TEXT"),
-        ("staff_name", "ALTER TABLE schedules ADD COLUMN staff_name TEXT"),
+    for column_ddl in [
+        "shift_time TEXT",
+        "department TEXT",
+        "phone_number TEXT",
+        "staff_name TEXT",
     ]:
-        if not column_exists(cur, "schedules", col):
-            cur.execute(ddl)
+        add_column(cur, "schedules", column_ddl)
 
+    # Both are rebuilt by ensure_indexes: the unique index to pick up its
+    # current definition, and idx_schedules_date_shift supersedes the old
+    # single-column date index.
     cur.execute("DROP INDEX IF EXISTS idx_schedules_unique_staff")
-    cur.execute(
-        """
-        CREATE UNIQUE INDEX IF NOT EXISTS idx_schedules_unique_staff
-        ON schedules(shift_date, staff_name, department, shift_time)
-        """
-    )
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_schedules_date ON schedules(shift_date)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_schedules_department ON schedules(department)")
+    cur.execute("DROP INDEX IF EXISTS idx_schedules_date")
 
     cur.execute(
         """
@@ -428,7 +423,6 @@ def ensure_schedule(cur):
         )
         """
     )
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_uploads_week ON schedule_uploads(week_start_date)")
 
 
 def ensure_wakeup_calls(cur):
@@ -449,26 +443,86 @@ def ensure_wakeup_calls(cur):
     )
 
 
+# Created after every table exists (and any rebuild has copied its rows) so
+# the b-trees are built back to back.
+INDEX_DDL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_login_attempts_username ON login_attempts(username)",
+    "CREATE INDEX IF NOT EXISTS idx_log_entries_created_at ON log_entries(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_log_entries_record ON log_entries(related_record_id)",
+    "CREATE INDEX IF NOT EXISTS idx_log_entries_maintenance ON log_entries(related_maintenance_id)",
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_status ON maintenance_items(status)",
+    # Partial index over unarchived messages that can expire, for
+    # archive_expired_messages()
+    "CREATE INDEX IF NOT EXISTS idx_inhouse_expire_pending ON in_house_messages(expires_at) "
+    "WHERE archived = 0 AND expires_at IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_housekeeping_service_dates_request ON housekeeping_service_dates(housekeeping_request_id)",
+    "CREATE INDEX IF NOT EXISTS idx_housekeeping_service_dates_date ON housekeeping_service_dates(service_date, is_active)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_schedules_unique_staff ON schedules(shift_date, staff_name, department, shift_time)",
+    # Day views filter on shift_date and order by shift_id. Here the unique
+    # index leads (shift_date, staff_name, ...), so it can't serve shift_id.
+    "CREATE INDEX IF NOT EXISTS idx_schedules_date_shift ON schedules(shift_date, shift_id)",
+    "CREATE INDEX IF NOT EXISTS idx_schedules_department ON schedules(department)",
+    "CREATE INDEX IF NOT EXISTS idx_uploads_week ON schedule_uploads(week_start_date)",
+]
+
+
+def ensure_indexes(cur):
+    # executescript() would commit main()'s transaction, so run them singly.
+    for ddl in INDEX_DDL:
+        cur.execute(ddl)
+
+
 # --- runner ---------------------------------------------------------------
 
 def main():
     conn = connect()
-    cur = conn.cursor()
+    # WAL with NORMAL sync keeps the table rebuilds from fsyncing on every
+    # page write. journal_mode persists in the database file, so the app's
+    # own mode is put back before closing.
+    previous_journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+
+    try:
+        migrate(conn)
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            conn.execute(f"PRAGMA journal_mode = {previous_journal_mode}")
+        except sqlite3.OperationalError as e:
+            # Leaving WAL needs exclusive access; a running app server blocks it
+            print(f"Warning: could not restore journal_mode={previous_journal_mode}: {e}")
+        conn.close()
+    print(f"Database upgraded/verified at {DB_PATH}")
 
-    ensure_users(cur)
-    ensure_login_attempts(cur)
-    ensure_records_core(cur)
-    ensure_log_tables(cur)
-    ensure_supporting_tables(cur)
-    ensure_in_house_messages(cur)
-    ensure_housekeeping(cur)
-    ensure_schedule(cur)
-    ensure_wakeup_calls(cur)
 
-    conn.commit()
-    conn.close()
-    print(f"Database upgraded/verified at {DB_PATH}")
+def migrate(conn):
+    cur = conn.cursor()
+    # sqlite3 leaves DDL in autocommit mode, so without an explicit
+    # transaction every CREATE/ALTER below would commit (and sync) on its own.
+    cur.execute("BEGIN IMMEDIATE")
+
+    # Databases already at SCHEMA_VERSION skip straight to data maintenance.
+    if cur.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        ensure_users(cur)
+        ensure_login_attempts(cur)
+        ensure_records_core(cur)
+        ensure_log_tables(cur)
+        ensure_supporting_tables(cur)
+        ensure_in_house_messages(cur)
+        ensure_housekeeping(cur)
+        ensure_schedule(cur)
+        ensure_wakeup_calls(cur)
+        ensure_indexes(cur)
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    archive_expired_messages(cur)
 
+    conn.commit()
+    # Seed planner statistics for rebuilt tables and freshly created indexes.
+    conn.execute("PRAGMA analysis_limit=400")
+    conn.execute("PRAGMA optimize")
 
 if __name__ == "__main__":
     main()